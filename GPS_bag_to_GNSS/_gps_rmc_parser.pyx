@@ -0,0 +1,66 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled GpsRmc parser for bag_to_gnss.py
+
+C implementation of _fast_parse_latlon: walks the length-prefixed strings
+with pointer arithmetic and copies the two float64 fields out directly.
+bag_to_gnss.py uses it automatically once built, otherwise it falls back to
+the pure-Python parser.
+
+Build in place with:
+    python setup.py build_ext --inplace
+"""
+
+import struct
+
+from libc.stdint cimport uint32_t
+from libc.string cimport memcpy
+
+
+cdef inline uint32_t _read_u32(const unsigned char[::1] buf, Py_ssize_t offset) nogil:
+    """Read a little-endian uint32."""
+    return (<uint32_t>buf[offset] | (<uint32_t>buf[offset+1] << 8) |
+            (<uint32_t>buf[offset+2] << 16) | (<uint32_t>buf[offset+3] << 24))
+
+
+cpdef tuple parse(const unsigned char[::1] buf):
+    """Parse (latitude, longitude, fix_ok) from a GpsRmc payload.
+
+    The float64 fields are copied as-is, so this assumes a little-endian host
+    (as the message format is).
+
+    Raises:
+        struct.error: If the payload is truncated
+    """
+    cdef Py_ssize_t size = buf.shape[0]
+    cdef Py_ssize_t offset = 0
+    cdef Py_ssize_t length
+    cdef double lat
+    cdef double lon
+    cdef bint fix_ok
+    cdef int i
+
+    # string systemLog, string time
+    for i in range(2):
+        if offset + 4 > size:
+            raise struct.error("truncated GpsRmc payload")
+        offset += 4 + _read_u32(buf, offset)
+
+    # string status: a valid fix is exactly "A" (0x41) plus null terminator
+    if offset + 4 > size:
+        raise struct.error("truncated GpsRmc payload")
+    length = _read_u32(buf, offset)
+    fix_ok = length == 2 and offset + 5 < size and buf[offset+4] == 0x41
+    offset += 4 + length
+
+    # float64 Lat, string N, float64 Lon
+    if offset + 12 > size:
+        raise struct.error("truncated GpsRmc payload")
+    memcpy(&lat, &buf[offset], 8)
+    offset += 8
+    offset += 4 + _read_u32(buf, offset)
+    if offset + 8 > size:
+        raise struct.error("truncated GpsRmc payload")
+    memcpy(&lon, &buf[offset], 8)
+
+    return lat, lon, fix_ok
@@ -7,19 +7,179 @@ Uses the rosbags library by Ternaris for bag file parsing.
 """
 
 import argparse
+import itertools
 import os
+import queue
 import sys
 import struct
-from datetime import datetime
+import threading
 from pathlib import Path
 
+# Optional compiled GpsRmc hot-path parser (the Cython extension built with setup.py)
 try:
-    from rosbags.rosbag1 import Reader
-    from rosbags.serde import deserialize_cdr
+    from _gps_rmc_parser import parse as _c_parse_latlon
 except ImportError:
-    print("Error: rosbags library not found. Please install it with:")
-    print("pip install rosbags")
-    sys.exit(1)
+    _c_parse_latlon = None
+
+
+# Topic carrying the rshandheld_location/msg/GpsRmc messages
+GPS_TOPIC = '/GPSRMC'
+
+
+# Precompiled unpackers for the little-endian GpsRmc wire format
+_U32 = struct.Struct('<I').unpack_from
+_F64 = struct.Struct('<d').unpack_from
+
+# Large write buffer so output files are flushed in big blocks rather than per line
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# Text GNSS output is written as ASCII bytes straight to a file descriptor,
+# bypassing TextIOWrapper, in batches of this many lines (~100 KiB)
+_RAW_OPEN_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+_WRITE_BATCH_LINES = 1024
+
+# Maximum number of raw messages buffered between the bag reader thread and the converter
+_READ_QUEUE_SIZE = 256
+
+# Print a progress line every this many converted messages
+_PROGRESS_INTERVAL = 1000
+
+# GNSS line template: 11 space-separated columns (see GNSSFormatter.create_gnss_line)
+_GNSS_FMT = "%d %s %s %s %s %s %s %s %s %d %d"
+
+# Binary GNSS output (--binary): an 8-byte magic, the uint32 record size, then one
+# fixed-width little-endian record per message:
+# int64 timestamp_ns, float64 lat, float64 lon, int64 timestamp_ms, uint8 fix_quality
+_BINARY_MAGIC = b"GNSSBIN1"
+_BINARY_RECORD = struct.Struct('<qddqB')
+_BINARY_HEADER = _BINARY_MAGIC + struct.pack('<I', _BINARY_RECORD.size)
+_BINARY_BATCH_RECORDS = 4096
+
+# Last (whole second, "H:M:S") pair produced by create_gnss_line
+_gps_time_cache = [-1, ""]
+
+
+def _write_lines(fd, lines):
+    """Write newline-terminated lines to a raw file descriptor as ASCII bytes."""
+    data = memoryview(("\n".join(lines) + "\n").encode('ascii'))
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def _read_string(data, offset):
+    """Read a length-prefixed string field, returning (value, new_offset).
+    
+    data may be a memoryview; the string is decoded straight from the buffer.
+    """
+    length = _U32(data, offset)[0]
+    string_data = str(data[offset+4:offset+4+length-1], 'utf-8')  # -1 to remove null terminator
+    return string_data, offset + 4 + length
+
+
+def _read_float64(data, offset):
+    """Read a float64 field, returning (value, new_offset)."""
+    return _F64(data, offset)[0], offset + 8
+
+
+# Field readers in GpsRmc order: string systemLog, string time, string status,
+# float64 Lat, string N, float64 Lon, string E, float64 spd, float64 cog,
+# float64 mv, string mvE, string mode, string navStates
+_GPS_RMC_LAYOUT = (
+    _read_string, _read_string, _read_string, _read_float64, _read_string,
+    _read_float64, _read_string, _read_float64, _read_float64, _read_float64,
+    _read_string, _read_string, _read_string,
+)
+
+
+def _fast_parse_latlon(rawdata):
+    """Parse only the fields the GNSS output needs from a GpsRmc payload.
+
+    Skips systemLog and time, checks the status for a valid ('A') fix, and
+    reads Lat and Lon directly; the trailing fields are never touched.
+
+    Returns:
+        tuple: (latitude, longitude, fix_ok)
+
+    Raises:
+        struct.error: If the payload is truncated
+    """
+    # string systemLog, string time
+    offset = 4 + _U32(rawdata, 0)[0]
+    offset += 4 + _U32(rawdata, offset)[0]
+    
+    # string status
+    length = _U32(rawdata, offset)[0]
+    status_offset = offset + 4
+    offset = status_offset + length
+    
+    # float64 Lat; reading it first guarantees the status byte is in range
+    lat = _F64(rawdata, offset)[0]
+    offset += 8
+    
+    # A valid fix is exactly "A" (0x41) plus null terminator; compare the raw byte
+    fix_ok = length == 2 and rawdata[status_offset] == 0x41
+    
+    # string N, float64 Lon
+    offset += 4 + _U32(rawdata, offset)[0]
+    lon = _F64(rawdata, offset)[0]
+    
+    return lat, lon, fix_ok
+
+
+if _c_parse_latlon is not None:
+    _parse_latlon = _c_parse_latlon
+else:
+    _parse_latlon = _fast_parse_latlon
+
+
+def _get_reader():
+    """Import and return the rosbags ROS1 Reader.
+    
+    Imported on first use so that --help and argument errors do not pay for
+    loading rosbags.
+    """
+    try:
+        from rosbags.rosbag1 import Reader
+    except ImportError:
+        print("Error: rosbags library not found. Please install it with:")
+        print("pip install rosbags")
+        sys.exit(1)
+    return Reader
+
+
+def _advise_sequential(reader):
+    """Tell the kernel the open bag file will be read front to back.
+    
+    On Linux this enlarges read-ahead for the reader's file handle; it is
+    skipped where posix_fadvise is unavailable (e.g. Windows, macOS).
+    """
+    bio = getattr(reader, 'bio', None)
+    if bio is None or not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        os.posix_fadvise(bio.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+    except OSError:
+        pass
+
+
+def _should_read_in_background(reader):
+    """Return True if the bag is worth reading on a separate thread.
+    
+    Only bz2 decompression takes long enough, with the GIL released, to pay
+    for the queue handoff, and only when another CPU can run it; rosbags
+    keeps just each chunk's decompressor, so compare against bz2's.
+    """
+    if (os.cpu_count() or 1) < 2:
+        return False
+    
+    import bz2
+    chunks = getattr(reader, 'chunks', None) or {}
+    return any(chunk.decompressor is bz2.decompress for chunk in chunks.values())
+
+
+def _chunk_filename(chunk_index):
+    """Return the HD Mapping file name for a chunk, e.g. gnss0003.gnss."""
+    return f"gnss{chunk_index:04d}.gnss"
 
 
 class GNSSFormatter:
@@ -27,11 +187,16 @@ class GNSSFormatter:
     
     @staticmethod
     def ros_time_to_gps_time(ros_timestamp):
-        """Convert ROS timestamp to GPS time in H:M:S format."""
+        """Convert ROS timestamp to GPS time in H:M:S format.
+        
+        Not used on the conversion hot path; create_gnss_line derives the time
+        from the nanosecond timestamp directly.
+        """
         # ROS timestamp is typically in seconds since epoch
-        dt = datetime.utcfromtimestamp(ros_timestamp)
+        sec = int(ros_timestamp)
+        
         # Format as H:M:S (no leading zeros for hours)
-        return dt.strftime("%-H:%M:%S")
+        return "%d:%02d:%02d" % ((sec // 3600) % 24, (sec // 60) % 60, sec % 60)
     
     @staticmethod
     def timestamp_ns_to_ms(timestamp_ns):
@@ -46,41 +211,89 @@ class GNSSFormatter:
         
         Format: timestamp lat lon alt hdop satellites_tracked height age time fix_quality additional_timestamp
         """
-        # Convert timestamp to seconds for GPS time calculation
-        ros_time = timestamp_ns / 1e9
-        
-        # Generate GPS time if not provided
+        # Generate GPS time (H:M:S, UTC) if not provided, using integer arithmetic
         if gps_time is None:
-            gps_time = GNSSFormatter.ros_time_to_gps_time(ros_time)
+            sec = timestamp_ns // 1_000_000_000
+            
+            # Consecutive messages usually share the same second, so reuse the last result
+            if sec == _gps_time_cache[0]:
+                gps_time = _gps_time_cache[1]
+            else:
+                gps_time = "%d:%02d:%02d" % ((sec // 3600) % 24, (sec // 60) % 60, sec % 60)
+                _gps_time_cache[0] = sec
+                _gps_time_cache[1] = gps_time
         
         # Generate millisecond timestamp for column 11
-        timestamp_ms = GNSSFormatter.timestamp_ns_to_ms(timestamp_ns)
-        
-        # Format the line with all 11 columns
-        gnss_data = [
-            str(timestamp_ns),           # Column 1: timestamp (nanoseconds)
-            str(latitude),               # Column 2: lat (decimal degrees)
-            str(longitude),              # Column 3: lon (decimal degrees)
-            str(altitude),               # Column 4: alt (meters)
-            str(hdop),                   # Column 5: hdop (Horizontal Dilution of Precision)
-            str(satellites_tracked),     # Column 6: satellites_tracked
-            str(height),                 # Column 7: height (geoidal separation)
-            str(age),                    # Column 8: age (DGPS data age)
-            str(gps_time),               # Column 9: time (GPS time H:M:S)
-            str(fix_quality),            # Column 10: fix_quality
-            str(timestamp_ms)            # Column 11: additional timestamp (milliseconds)
-        ]
-        
-        return " ".join(gnss_data)
+        timestamp_ms = timestamp_ns // 1_000_000
+        
+        # Format the line with all 11 columns in a single pass
+        return _GNSS_FMT % (
+            timestamp_ns,                # Column 1: timestamp (nanoseconds)
+            latitude,                    # Column 2: lat (decimal degrees)
+            longitude,                   # Column 3: lon (decimal degrees)
+            altitude,                    # Column 4: alt (meters)
+            hdop,                        # Column 5: hdop (Horizontal Dilution of Precision)
+            satellites_tracked,          # Column 6: satellites_tracked
+            height,                      # Column 7: height (geoidal separation)
+            age,                         # Column 8: age (DGPS data age)
+            gps_time,                    # Column 9: time (GPS time H:M:S)
+            fix_quality,                 # Column 10: fix_quality
+            timestamp_ms                 # Column 11: additional timestamp (milliseconds)
+        )
+
+
+def _convert_chunk_worker(bag_path, chunk_path, start_ns, stop_ns):
+    """Convert the GPS messages in [start_ns, stop_ns) to one chunk file.
+    
+    Runs in a worker process: opens its own Reader and writes chunk_path
+    independently of the other chunks. stop_ns is None for the last chunk.
+    
+    Returns:
+        tuple: (message_count, processed_count, bad_message_count)
+    """
+    Reader = _get_reader()
+    
+    parse = _parse_latlon
+    create_gnss_line = GNSSFormatter.create_gnss_line
+    lines = []
+    message_count = 0
+    bad_message_count = 0
+    
+    with Reader(bag_path) as reader:
+        _advise_sequential(reader)
+        gps_connections = [c for c in reader.connections if c.topic == GPS_TOPIC]
+        for connection, timestamp, rawdata in reader.messages(connections=gps_connections,
+                                                              start=start_ns, stop=stop_ns):
+            message_count += 1
+            try:
+                latitude, longitude, fix_ok = parse(rawdata)
+            except struct.error:
+                bad_message_count += 1
+                continue
+            lines.append(create_gnss_line(int(timestamp), latitude, longitude,
+                                          fix_quality=1 if fix_ok else 0))
+    
+    fd = os.open(chunk_path, _RAW_OPEN_FLAGS, 0o644)
+    try:
+        if lines:
+            _write_lines(fd, lines)
+    finally:
+        os.close(fd)
+    
+    return message_count, len(lines), bad_message_count
 
 
 class BagToGNSSConverter:
     """Main converter class for processing ROS1 bag files."""
     
-    def __init__(self, bag_path, output_path=None, chunked=False, chunk_duration=20.0):
+    def __init__(self, bag_path, output_path=None, chunked=False, chunk_duration=20.0,
+                 binary=False, jobs=1):
         self.bag_path = Path(bag_path)
         self.chunked = chunked
+        self.binary = binary
+        self.jobs = jobs  # Worker processes for chunked output (1 = serial)
         self.chunk_duration = chunk_duration
+        self._chunk_duration_ns = int(chunk_duration * 1_000_000_000)
         
         if chunked:
             # For chunked output, output_path should be a directory
@@ -93,60 +306,54 @@ class BagToGNSSConverter:
             # Ensure output directory exists
             self.output_dir.mkdir(exist_ok=True)
             self.output_path = None  # Will be set per chunk
+            
+            # Plain-string directory prefix for chunk paths, so rollover avoids Path joins
+            self._chunk_dir_prefix = os.path.join(str(self.output_dir), "")
         else:
             # For single file output
             if output_path:
                 self.output_path = Path(output_path)
             else:
                 # Default output filename based on input bag filename
-                self.output_path = self.bag_path.with_suffix('.gnss')
+                self.output_path = self.bag_path.with_suffix('.gnssbin' if binary else '.gnss')
             self.output_dir = None
         
         self.message_count = 0
         self.processed_count = 0
+        self.bad_message_count = 0
         
         # Chunking state
         self.current_chunk_start = None
-        self.current_chunk_file = None
+        self.current_chunk_fd = None
         self.chunk_counter = 0
+        self._chunk_lines = []  # GNSS lines pending for the current chunk file
     
     def parse_custom_gps_message(self, rawdata):
         """Parse the custom rshandheld_location/msg/GpsRmc message format."""
         try:
             offset = 0
             
-            # Parse string fields (length-prefixed)
-            def read_string(data, offset):
-                length = struct.unpack('<I', data[offset:offset+4])[0]
-                offset += 4
-                string_data = data[offset:offset+length-1].decode('utf-8')  # -1 to remove null terminator
-                offset += length
-                return string_data, offset
-            
-            # Parse float64 fields
-            def read_float64(data, offset):
-                value = struct.unpack('<d', data[offset:offset+8])[0]
-                offset += 8
-                return value, offset
+            # Slice a memoryview so fields are read without intermediate copies
+            rawdata = memoryview(rawdata)
             
             # Parse the message according to the definition:
             # string systemLog, string time, string status, float64 Lat, string N, 
             # float64 Lon, string E, float64 spd, float64 cog, float64 mv, 
             # string mvE, string mode, string navStates
             
-            system_log, offset = read_string(rawdata, offset)
-            time_str, offset = read_string(rawdata, offset)
-            status, offset = read_string(rawdata, offset)
-            lat, offset = read_float64(rawdata, offset)
-            n_indicator, offset = read_string(rawdata, offset)
-            lon, offset = read_float64(rawdata, offset)
-            e_indicator, offset = read_string(rawdata, offset)
-            speed, offset = read_float64(rawdata, offset)
-            course, offset = read_float64(rawdata, offset)
-            mv, offset = read_float64(rawdata, offset)
-            mv_e, offset = read_string(rawdata, offset)
-            mode, offset = read_string(rawdata, offset)
-            nav_states, offset = read_string(rawdata, offset)
+            system_log, offset = _read_string(rawdata, offset)
+            time_str, offset = _read_string(rawdata, offset)
+            status, offset = _read_string(rawdata, offset)
+            lat, offset = _read_float64(rawdata, offset)
+            n_indicator, offset = _read_string(rawdata, offset)
+            lon, offset = _read_float64(rawdata, offset)
+            e_indicator, offset = _read_string(rawdata, offset)
+            speed, offset = _read_float64(rawdata, offset)
+            course, offset = _read_float64(rawdata, offset)
+            mv, offset = _read_float64(rawdata, offset)
+            mv_e, offset = _read_string(rawdata, offset)
+            mode, offset = _read_string(rawdata, offset)
+            nav_states, offset = _read_string(rawdata, offset)
             
             # Apply direction indicators to coordinates
             # NOTE: This logic is currently commented out because the GPS data in the bag files
@@ -193,6 +400,8 @@ class BagToGNSSConverter:
         """Inspect the bag file to understand message structure."""
         print(f"Inspecting bag file: {self.bag_path}")
         
+        Reader = _get_reader()
+        
         try:
             with Reader(str(self.bag_path)) as reader:
                 # Print basic bag info
@@ -225,6 +434,7 @@ class BagToGNSSConverter:
                                 
                                 try:
                                     # Try to deserialize with rosbags
+                                    from rosbags.serde import deserialize_cdr
                                     deserialized = deserialize_cdr(rawdata, connection.msgtype)
                                     print(f"Message structure: {type(deserialized)}")
                                     print(f"Message fields: {dir(deserialized)}")
@@ -242,6 +452,7 @@ class BagToGNSSConverter:
                                     # Try to parse raw message data
                                     try:
                                         print(f"Raw message (first 100 bytes): {rawdata[:100]}")
+                                        print(f"Parsed message: {self.parse_custom_gps_message(rawdata)}")
                                         message_found = True
                                         break
                                     except Exception as e2:
@@ -266,88 +477,392 @@ class BagToGNSSConverter:
         
         return True
     
-    def _should_start_new_chunk(self, timestamp):
-        """Check if a new chunk should be started based on timestamp."""
-        if self.current_chunk_start is None:
-            return True
+    def _gps_connections(self, reader):
+        """Return the bag connections carrying GPS messages."""
+        return [c for c in reader.connections if c.topic == GPS_TOPIC]
+    
+    def _report_missing_gps_topic(self, reader):
+        """Explain why no GPS messages were converted."""
+        print(f"Warning: No {GPS_TOPIC} messages found in bag file")
+        print(f"Topics in bag:")
+        for topic_name, topic_info in reader.topics.items():
+            print(f"  - {topic_name}: {topic_info.msgtype} ({topic_info.msgcount} messages)")
+        print("Run with --inspect to examine the bag structure.")
+    
+    def _check_gps_message_layout(self, rawdata):
+        """Strictly parse one GpsRmc payload and confirm it matches the expected layout."""
+        try:
+            offset = 0
+            for read_field in _GPS_RMC_LAYOUT:
+                _, offset = read_field(rawdata, offset)
+        except (struct.error, UnicodeDecodeError) as e:
+            print(f"Error: GPS message does not match the GpsRmc layout: {e}")
+            return False
+        
+        if offset != len(rawdata):
+            print(f"Error: GPS message does not match the GpsRmc layout: "
+                  f"fields span {offset} bytes, message is {len(rawdata)} bytes")
+            return False
+        
+        return True
+    
+    def _gps_messages(self, reader):
+        """Return an iterator over the bag's GPS messages.
+        
+        The first message is checked against the GpsRmc layout up front so
+        the conversion loop can use the lean parser without per-message
+        validation. Returns None if that check fails.
+        """
+        # Only iterate the GPS connection(s); other topics are never read
+        messages = self._read_messages(reader, self._gps_connections(reader))
+        
+        first = next(messages, None)
+        if first is None:
+            return iter(())
         
-        # Convert timestamp from nanoseconds to seconds
-        timestamp_s = timestamp / 1e9
-        chunk_start_s = self.current_chunk_start / 1e9
+        if not self._check_gps_message_layout(first[2]):
+            messages.close()
+            return None
         
-        return (timestamp_s - chunk_start_s) > self.chunk_duration
+        return itertools.chain((first,), messages)
+    
+    def _read_messages(self, reader, connections):
+        """Yield (connection, timestamp, rawdata) for the given connections.
+        
+        bz2-compressed bags on multi-core machines are read on a background
+        thread feeding a bounded queue, so chunk decompression overlaps with
+        parsing and formatting here. Otherwise rosbags' reading is GIL-bound
+        and the handoff only adds overhead, so messages are iterated directly.
+        """
+        # rosbags treats an empty connection list as "all connections"
+        if not connections:
+            return
+        
+        _advise_sequential(reader)
+        
+        if not _should_read_in_background(reader):
+            yield from reader.messages(connections=connections)
+            return
+        
+        message_queue = queue.Queue(maxsize=_READ_QUEUE_SIZE)
+        stop = threading.Event()
+        errors = []
+        
+        def produce():
+            try:
+                for message in reader.messages(connections=connections):
+                    message_queue.put(message)
+                    if stop.is_set():
+                        break
+            except Exception as e:
+                errors.append(e)
+            finally:
+                message_queue.put(None)
+        
+        producer = threading.Thread(target=produce, name="bag-reader", daemon=True)
+        producer.start()
+        
+        try:
+            while True:
+                message = message_queue.get()
+                if message is None:
+                    break
+                yield message
+            
+            # Re-raise reader errors in the consuming thread
+            if errors:
+                raise errors[0]
+        finally:
+            # Unblock and join the reader if the consumer stopped early
+            stop.set()
+            while producer.is_alive():
+                try:
+                    message_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            producer.join()
+    
+    def _should_start_new_chunk(self, timestamp):
+        """Check if a new chunk should be started based on timestamp."""
+        # Integer nanosecond comparison, no per-message float arithmetic
+        return (self.current_chunk_start is None or
+                (timestamp - self.current_chunk_start) > self._chunk_duration_ns)
     
     def _start_new_chunk(self, timestamp):
         """Start a new chunk file."""
-        # Close previous chunk file if open
-        if self.current_chunk_file:
-            self.current_chunk_file.close()
+        # Flush and close previous chunk file if open
+        self._close_current_chunk()
         
         # Create new chunk filename
-        chunk_filename = f"gnss{self.chunk_counter:04d}.gnss"
-        chunk_path = self.output_dir / chunk_filename
+        chunk_filename = _chunk_filename(self.chunk_counter)
+        chunk_path = self._chunk_dir_prefix + chunk_filename
         
         # Open new chunk file
-        self.current_chunk_file = open(chunk_path, 'w')
+        self.current_chunk_fd = os.open(chunk_path, _RAW_OPEN_FLAGS, 0o644)
         self.current_chunk_start = timestamp
         
         print(f"Started chunk {self.chunk_counter}: {chunk_filename}")
         self.chunk_counter += 1
     
     def _close_current_chunk(self):
-        """Close the current chunk file."""
-        if self.current_chunk_file:
-            self.current_chunk_file.close()
-            self.current_chunk_file = None
+        """Write any pending lines and close the current chunk file."""
+        if self.current_chunk_fd is not None:
+            try:
+                if self._chunk_lines:
+                    _write_lines(self.current_chunk_fd, self._chunk_lines)
+                    self._chunk_lines.clear()
+            finally:
+                os.close(self.current_chunk_fd)
+                self.current_chunk_fd = None
     
     def convert_to_gnss(self):
         """Convert GPS messages from bag file to GNSS format."""
-        if self.chunked:
+        if self.chunked and self.jobs > 1:
+            return self._convert_to_gnss_chunked_parallel()
+        elif self.chunked:
             return self._convert_to_gnss_chunked()
+        elif self.binary:
+            return self._convert_to_gnss_binary()
         else:
             return self._convert_to_gnss_single()
     
+    def _convert_messages(self, messages, write_line):
+        """Run the shared conversion loop over the GPS messages.
+        
+        Both text outputs go through this loop; they differ only in where a
+        formatted line is sent.
+        
+        Args:
+            messages: Iterable of (connection, timestamp, rawdata) tuples
+            write_line: Callable taking (timestamp_ns, gnss_line)
+        """
+        # Bind hot-loop lookups and counters to locals
+        parse = _parse_latlon
+        create_gnss_line = GNSSFormatter.create_gnss_line
+        message_count = self.message_count
+        processed_count = self.processed_count
+        bad_message_count = self.bad_message_count
+        
+        for connection, timestamp, rawdata in messages:
+            message_count += 1
+            
+            # Parse the custom GPS message format; the layout was
+            # validated up front, so only truncation is expected here
+            try:
+                latitude, longitude, fix_ok = parse(rawdata)
+            except struct.error:
+                bad_message_count += 1
+                continue
+            
+            # Format as GNSS; fix quality is 1 for an 'A' (valid) status
+            timestamp_ns = int(timestamp)
+            write_line(timestamp_ns, create_gnss_line(timestamp_ns, latitude, longitude,
+                                                      fix_quality=1 if fix_ok else 0))
+            processed_count += 1
+            
+            if processed_count % _PROGRESS_INTERVAL == 0:
+                print(f"Processed {processed_count} messages...")
+        
+        self.message_count = message_count
+        self.processed_count = processed_count
+        self.bad_message_count = bad_message_count
+    
     def _convert_to_gnss_single(self):
         """Convert GPS messages to a single GNSS file."""
         print(f"Converting {self.bag_path} to GNSS format...")
         print(f"Output file: {self.output_path}")
         
+        Reader = _get_reader()
+        
         try:
             with Reader(str(self.bag_path)) as reader:
-                with open(self.output_path, 'w') as output_file:
+                output_fd = os.open(self.output_path, _RAW_OPEN_FLAGS, 0o644)
+                try:
+                    messages = self._gps_messages(reader)
+                    if messages is None:
+                        return False
                     
-                    for connection, timestamp, rawdata in reader.messages():
-                        if connection.topic == '/GPSRMC':
-                            self.message_count += 1
-                            
-                            try:
-                                # Parse the custom GPS message format
-                                gps_data = self.parse_custom_gps_message(rawdata)
-                                
-                                if gps_data:
-                                    # Extract GPS data and format as GNSS
-                                    gnss_line = self._extract_and_format_gnss_data(gps_data, timestamp)
-                                    
-                                    if gnss_line:
-                                        # Write GNSS format line
-                                        output_file.write(f"{gnss_line}\n")
-                                        self.processed_count += 1
-                                        
-                                        if self.processed_count % 50 == 0:
-                                            print(f"Processed {self.processed_count} messages...")
-                                else:
-                                    print(f"Failed to parse message {self.message_count}")
-                                        
-                            except Exception as e:
-                                print(f"Error processing message {self.message_count}: {e}")
-                                continue
+                    lines = []
+                    append_line = lines.append
+                    
+                    def write_line(timestamp_ns, gnss_line):
+                        # Queue the line and write in batches
+                        append_line(gnss_line)
+                        if len(lines) >= _WRITE_BATCH_LINES:
+                            _write_lines(output_fd, lines)
+                            lines.clear()
+                    
+                    self._convert_messages(messages, write_line)
+                    
+                    # Write the last partial batch
+                    if lines:
+                        _write_lines(output_fd, lines)
+                    
+                    if self.message_count == 0:
+                        self._report_missing_gps_topic(reader)
                     
                     print(f"\nConversion complete!")
                     print(f"Total messages found: {self.message_count}")
                     print(f"Successfully processed: {self.processed_count}")
+                    if self.bad_message_count:
+                        print(f"Skipped malformed messages: {self.bad_message_count}")
                     print(f"Output saved to: {self.output_path}")
                     print(f"Format: Each line contains 11 space-separated columns as expected by HD Mapping")
                     
+                finally:
+                    os.close(output_fd)
+                    
+        except Exception as e:
+            print(f"Error during conversion: {e}")
+            return False
+        
+        return True
+    
+    def _convert_to_gnss_binary(self):
+        """Convert GPS messages to a single binary GNSS file (see _BINARY_RECORD)."""
+        print(f"Converting {self.bag_path} to binary GNSS format...")
+        print(f"Output file: {self.output_path}")
+        
+        Reader = _get_reader()
+        
+        try:
+            with Reader(str(self.bag_path)) as reader:
+                with open(self.output_path, 'wb', buffering=_WRITE_BUFFER_SIZE) as output_file:
+                    
+                    messages = self._gps_messages(reader)
+                    if messages is None:
+                        return False
+                    
+                    output_file.write(_BINARY_HEADER)
+                    
+                    # Records are packed into a preallocated batch buffer
+                    record_size = _BINARY_RECORD.size
+                    batch = bytearray(record_size * _BINARY_BATCH_RECORDS)
+                    batch_end = len(batch)
+                    batch_offset = 0
+                    
+                    # Bind hot-loop lookups and counters to locals
+                    parse = _parse_latlon
+                    pack_into = _BINARY_RECORD.pack_into
+                    write = output_file.write
+                    message_count = self.message_count
+                    processed_count = self.processed_count
+                    bad_message_count = self.bad_message_count
+                    
+                    for connection, timestamp, rawdata in messages:
+                        message_count += 1
+                        
+                        # Parse the custom GPS message format; the layout was
+                        # validated up front, so only truncation is expected here
+                        try:
+                            latitude, longitude, fix_ok = parse(rawdata)
+                        except struct.error:
+                            bad_message_count += 1
+                            continue
+                        
+                        timestamp_ns = int(timestamp)
+                        pack_into(batch, batch_offset, timestamp_ns, latitude, longitude,
+                                  timestamp_ns // 1_000_000, 1 if fix_ok else 0)
+                        batch_offset += record_size
+                        if batch_offset == batch_end:
+                            write(batch)
+                            batch_offset = 0
+                        processed_count += 1
+                        
+                        if processed_count % _PROGRESS_INTERVAL == 0:
+                            print(f"Processed {processed_count} messages...")
+                    
+                    # Write the partially filled last batch
+                    write(memoryview(batch)[:batch_offset])
+                    
+                    self.message_count = message_count
+                    self.processed_count = processed_count
+                    self.bad_message_count = bad_message_count
+                    
+                    if self.message_count == 0:
+                        self._report_missing_gps_topic(reader)
+                    
+                    print(f"\nBinary conversion complete!")
+                    print(f"Total messages found: {self.message_count}")
+                    print(f"Successfully processed: {self.processed_count}")
+                    if self.bad_message_count:
+                        print(f"Skipped malformed messages: {self.bad_message_count}")
+                    print(f"Output saved to: {self.output_path}")
+                    print(f"Format: {record_size}-byte records (timestamp_ns, lat, lon, timestamp_ms, fix_quality)")
+                    
+        except Exception as e:
+            print(f"Error during conversion: {e}")
+            return False
+        
+        return True
+    
+    def _chunk_ranges(self, reader, connections):
+        """Split the GPS messages into chunks using the bag index.
+        
+        Applies the same rule as _should_start_new_chunk to the indexed
+        message timestamps, without reading any message data.
+        
+        Returns:
+            list: (chunk_index, start_ns, stop_ns) tuples; stop_ns is exclusive
+            and None for the last chunk
+        """
+        timestamps = sorted(entry.time for c in connections for entry in reader.indexes[c.id])
+        
+        starts = []
+        for timestamp in timestamps:
+            if not starts or (timestamp - starts[-1]) > self._chunk_duration_ns:
+                starts.append(timestamp)
+        
+        stops = starts[1:] + [None]
+        return [(index, start, stop) for index, (start, stop) in enumerate(zip(starts, stops))]
+    
+    def _convert_to_gnss_chunked_parallel(self):
+        """Convert GPS messages to chunked GNSS files, one worker process per chunk."""
+        print(f"Converting {self.bag_path} to chunked GNSS format...")
+        print(f"Output directory: {self.output_dir}")
+        print(f"Chunk duration: {self.chunk_duration} seconds")
+        print(f"Worker processes: {self.jobs}")
+        
+        Reader = _get_reader()
+        
+        try:
+            with Reader(str(self.bag_path)) as reader:
+                gps_connections = self._gps_connections(reader)
+                
+                # Validate the layout once here; workers use the lean parser
+                first = next(reader.messages(connections=gps_connections), None) if gps_connections else None
+                if first is not None and not self._check_gps_message_layout(first[2]):
+                    return False
+                
+                ranges = self._chunk_ranges(reader, gps_connections) if first is not None else []
+                
+                if not ranges:
+                    self._report_missing_gps_topic(reader)
+            
+            tasks = [(str(self.bag_path), self._chunk_dir_prefix + _chunk_filename(index), start, stop)
+                     for index, start, stop in ranges]
+            
+            if tasks:
+                # Imported here, like rosbags, so that startup does not pay for it
+                import multiprocessing
+                with multiprocessing.Pool(processes=min(self.jobs, len(tasks))) as pool:
+                    results = pool.starmap(_convert_chunk_worker, tasks)
+                
+                for message_count, processed_count, bad_message_count in results:
+                    self.message_count += message_count
+                    self.processed_count += processed_count
+                    self.bad_message_count += bad_message_count
+            
+            self.chunk_counter = len(tasks)
+            
+            print(f"\nChunked conversion complete!")
+            print(f"Total messages found: {self.message_count}")
+            print(f"Successfully processed: {self.processed_count}")
+            if self.bad_message_count:
+                print(f"Skipped malformed messages: {self.bad_message_count}")
+            print(f"Created {self.chunk_counter} chunk files in: {self.output_dir}")
+            print(f"Format: Each line contains 11 space-separated columns as expected by HD Mapping")
+            
         except Exception as e:
             print(f"Error during conversion: {e}")
             return False
@@ -360,45 +875,42 @@ class BagToGNSSConverter:
         print(f"Output directory: {self.output_dir}")
         print(f"Chunk duration: {self.chunk_duration} seconds")
         
+        Reader = _get_reader()
+        
         try:
             with Reader(str(self.bag_path)) as reader:
                 
-                for connection, timestamp, rawdata in reader.messages():
-                    if connection.topic == '/GPSRMC':
-                        self.message_count += 1
-                        
-                        try:
-                            # Parse the custom GPS message format
-                            gps_data = self.parse_custom_gps_message(rawdata)
-                            
-                            if gps_data:
-                                # Check if we need to start a new chunk
-                                if self._should_start_new_chunk(timestamp):
-                                    self._start_new_chunk(timestamp)
-                                
-                                # Extract GPS data and format as GNSS
-                                gnss_line = self._extract_and_format_gnss_data(gps_data, timestamp)
-                                
-                                if gnss_line:
-                                    # Write GNSS format line
-                                    self.current_chunk_file.write(f"{gnss_line}\n")
-                                    self.processed_count += 1
-                                    
-                                    if self.processed_count % 50 == 0:
-                                        print(f"Processed {self.processed_count} messages...")
-                            else:
-                                print(f"Failed to parse message {self.message_count}")
-                                    
-                        except Exception as e:
-                            print(f"Error processing message {self.message_count}: {e}")
-                            continue
+                messages = self._gps_messages(reader)
+                if messages is None:
+                    return False
+                
+                # _chunk_lines is cleared in place on rollover, so its bound
+                # append stays valid across chunks
+                should_start_new_chunk = self._should_start_new_chunk
+                start_new_chunk = self._start_new_chunk
+                append_line = self._chunk_lines.append
+                
+                def write_line(timestamp_ns, gnss_line):
+                    # Check if we need to start a new chunk
+                    if should_start_new_chunk(timestamp_ns):
+                        start_new_chunk(timestamp_ns)
+                    
+                    # Hold the line until the chunk is closed
+                    append_line(gnss_line)
+                
+                self._convert_messages(messages, write_line)
                 
                 # Close the last chunk file
                 self._close_current_chunk()
                 
+                if self.message_count == 0:
+                    self._report_missing_gps_topic(reader)
+                
                 print(f"\nChunked conversion complete!")
                 print(f"Total messages found: {self.message_count}")
                 print(f"Successfully processed: {self.processed_count}")
+                if self.bad_message_count:
+                    print(f"Skipped malformed messages: {self.bad_message_count}")
                 print(f"Created {self.chunk_counter} chunk files in: {self.output_dir}")
                 print(f"Format: Each line contains 11 space-separated columns as expected by HD Mapping")
                     
@@ -409,39 +921,6 @@ class BagToGNSSConverter:
             return False
         
         return True
-    
-    def _extract_and_format_gnss_data(self, gps_data, timestamp):
-        """Extract GPS data from parsed message and format as GNSS raw data."""
-        try:
-            # Use ROS timestamp in nanoseconds
-            timestamp_ns = int(timestamp)
-            
-            # Extract coordinates from parsed GPS data
-            latitude = gps_data['latitude']
-            longitude = gps_data['longitude']
-            
-            # Determine fix quality based on status
-            fix_quality = 1 if gps_data['status'] == 'A' else 0
-            
-            # Create GNSS format line using the formatter
-            gnss_line = GNSSFormatter.create_gnss_line(
-                timestamp_ns=timestamp_ns,
-                latitude=latitude,
-                longitude=longitude,
-                altitude="nan",  # Not available in current data
-                hdop="nan",      # Not available in current data
-                satellites_tracked="nan",  # Not available in current data
-                height="nan",    # Not available in current data
-                age="nan",       # Not available in current data
-                gps_time=None,   # Will be generated from timestamp
-                fix_quality=fix_quality
-            )
-            
-            return gnss_line
-            
-        except Exception as e:
-            print(f"Error extracting GNSS data: {e}")
-            return None
 
 
 def main():
@@ -458,6 +937,10 @@ Examples:
   # Chunked output for HD Mapping compatibility
   python bag_to_gnss.py GPS_sample.bag --chunked
   python bag_to_gnss.py GPS_sample.bag --chunked --output ./gnss_chunks --chunk-duration 30
+  python bag_to_gnss.py GPS_sample.bag --chunked --jobs 4
+  
+  # Binary output (fixed-width records) for tools that read binary GNSS
+  python bag_to_gnss.py GPS_sample.bag --binary
   
   # Inspect bag structure
   python bag_to_gnss.py GPS_sample.bag --inspect
@@ -473,6 +956,10 @@ Examples:
                        help='Output chunked GNSS files for HD Mapping compatibility')
     parser.add_argument('--chunk-duration', '-d', type=float, default=20.0,
                        help='Duration of each chunk in seconds (default: 20.0, matching lidar tool)')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                       help='Worker processes for chunked output; chunks are converted in parallel (default: 1)')
+    parser.add_argument('--binary', '-b', action='store_true',
+                       help='Write fixed-width little-endian binary records instead of text (single file mode only)')
     
     args = parser.parse_args()
     
@@ -486,23 +973,36 @@ Examples:
         print(f"Error: Chunk duration must be positive, got {args.chunk_duration}")
         sys.exit(1)
     
+    # Validate worker count
+    if args.jobs < 1:
+        print(f"Error: Jobs must be at least 1, got {args.jobs}")
+        sys.exit(1)
+    
+    if args.jobs > 1 and not args.chunked:
+        print("Error: --jobs requires --chunked")
+        sys.exit(1)
+    
+    # Binary output is a single file
+    if args.binary and args.chunked:
+        print("Error: --binary cannot be combined with --chunked")
+        sys.exit(1)
+    
     # Create converter
     converter = BagToGNSSConverter(
         args.bag_file, 
         args.output, 
         chunked=args.chunked, 
-        chunk_duration=args.chunk_duration
+        chunk_duration=args.chunk_duration,
+        binary=args.binary,
+        jobs=args.jobs
     )
     
     if args.inspect:
         # Just inspect the bag structure
         converter.inspect_bag_structure()
     else:
-        # First inspect to understand structure, then convert
-        if converter.inspect_bag_structure():
-            converter.convert_to_gnss()
-        else:
-            print("Failed to inspect bag file structure.")
+        # Convert directly; a missing GPS topic is reported by the conversion itself
+        if not converter.convert_to_gnss():
             sys.exit(1)
 
 
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Builds the optional compiled GpsRmc parser used by bag_to_gnss.py.
+
+Usage:
+    pip install cython
+    python setup.py build_ext --inplace
+"""
+
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name="gps_rmc_parser",
+    ext_modules=cythonize("_gps_rmc_parser.pyx"),
+)
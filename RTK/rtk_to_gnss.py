@@ -24,9 +24,54 @@ Author: Eagle Scanner Project
 import argparse
 import sys
 import os
-from datetime import datetime
+import warnings
+from datetime import datetime, timedelta
 import re
 
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is optional; without it every line goes through the per-line parser
+    np = None
+
+
+# Columns read by the batch parser: GPST date and time, latitude, longitude,
+# height, Q, ns and column 12 (written to the age column)
+SOLUTION_COLUMNS = (0, 1, 2, 3, 4, 5, 6, 12)
+SOLUTION_DTYPE = [
+    ('date', 'U10'), ('time', 'U16'),
+    ('latitude', 'f8'), ('longitude', 'f8'), ('height', 'f8'),
+    ('quality', 'i8'), ('satellites', 'i8'), ('age', 'f8'),
+]
+
+
+def parse_gpst_datetime(gpst_str):
+    """
+    Parse a GPST timestamp string into a naive datetime.
+    
+    RTKLIB writes fixed-width "YYYY/MM/DD HH:MM:SS.SSS" timestamps, which are
+    read directly by slicing; any other layout goes through datetime.strptime.
+    
+    Args:
+        gpst_str (str): GPST timestamp in format "YYYY/MM/DD HH:MM:SS.SSS"
+    
+    Returns:
+        datetime: Parsed timestamp
+    
+    Raises:
+        ValueError: If the timestamp cannot be parsed
+    """
+    if (21 <= len(gpst_str) <= 26 and gpst_str[4] == '/' and gpst_str[7] == '/' and
+            gpst_str[10] == ' ' and gpst_str[13] == ':' and gpst_str[16] == ':' and
+            gpst_str[19] == '.' and
+            (gpst_str[:4] + gpst_str[5:7] + gpst_str[8:10] + gpst_str[11:13] +
+             gpst_str[14:16] + gpst_str[17:19] + gpst_str[20:]).isdigit()):
+        return datetime(int(gpst_str[:4]), int(gpst_str[5:7]), int(gpst_str[8:10]),
+                        int(gpst_str[11:13]), int(gpst_str[14:16]), int(gpst_str[17:19]),
+                        int(gpst_str[20:].ljust(6, '0')))
+    
+    return datetime.strptime(gpst_str, "%Y/%m/%d %H:%M:%S.%f")
+
 
 def parse_gpst_timestamp(gpst_str):
     """
@@ -40,17 +85,18 @@ def parse_gpst_timestamp(gpst_str):
     """
     try:
         # Parse the GPST timestamp format: 2025/05/11 18:22:46.000
-        dt = datetime.strptime(gpst_str, "%Y/%m/%d %H:%M:%S.%f")
+        dt = parse_gpst_datetime(gpst_str)
         
-        # Convert to Unix epoch
-        unix_timestamp = dt.timestamp()
+        # Convert to Unix epoch; only the whole seconds go through the float
+        # timestamp, which is exact for them
+        unix_us = int(dt.replace(microsecond=0).timestamp()) * 1_000_000 + dt.microsecond
         
-        # Convert to nanoseconds and milliseconds
-        nanoseconds = int(unix_timestamp * 1_000_000_000)
-        milliseconds = int(unix_timestamp * 1_000)
+        # Convert to nanoseconds and milliseconds with integer math
+        nanoseconds = unix_us * 1_000
+        milliseconds = unix_us // 1_000
         
         # Extract time portion (H:M:S)
-        time_str = dt.strftime("%H:%M:%S")
+        time_str = f"{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}"
         
         return nanoseconds, milliseconds, time_str
     
@@ -69,8 +115,9 @@ def parse_solution_line(line):
     Returns:
         dict: Parsed data fields or None if parsing fails
     """
-    # Split the line into fields
-    fields = line.strip().split()
+    # Split the line into fields; only the first 13 are used, so the
+    # remaining columns are left unsplit
+    fields = line.split(None, 13)
     
     # Expected format: GPST lat lon height Q ns sdn sde sdu sdne sdeu sdun age ratio
     # We need at least the first 8 fields for basic conversion
@@ -132,6 +179,112 @@ def convert_to_gnss_format(data):
     return ' '.join(gnss_line)
 
 
+def local_utc_offsets(naive_seconds):
+    """
+    Get the local UTC offset for naive timestamps, as used by datetime.timestamp().
+    
+    The offset is looked up once per distinct hour, since UTC offset changes
+    happen on hour boundaries.
+    
+    Args:
+        naive_seconds (ndarray): Wall-clock times as seconds since 1970-01-01
+    
+    Returns:
+        ndarray: Offset in seconds to add to each value to get Unix time
+    """
+    hours, index = np.unique(naive_seconds // 3600, return_inverse=True)
+    epoch = datetime(1970, 1, 1)
+    offsets = np.array([int((epoch + timedelta(hours=int(hour))).timestamp()) - int(hour) * 3600
+                        for hour in hours], dtype=np.int64)
+    return offsets[index]
+
+
+def parse_solution_file(infile):
+    """
+    Parse all data lines of a solution.pos file at once with NumPy.
+    
+    Args:
+        infile: Open solution.pos file (text mode)
+    
+    Returns:
+        list: GNSS format lines, or None if the file does not fit the fixed
+        column layout and has to be parsed line by line
+    """
+    try:
+        with warnings.catch_warnings():
+            # A file with only header lines is not an error here
+            warnings.simplefilter('ignore', UserWarning)
+            data = np.loadtxt(infile, dtype=SOLUTION_DTYPE, comments='%',
+                              usecols=SOLUTION_COLUMNS, ndmin=1)
+        
+        # GPST date and time as naive datetime64, e.g. 2025-05-11T18:22:46.000
+        gpst = np.char.add(np.char.add(np.char.replace(data['date'], '/', '-'), 'T'), data['time'])
+        naive_us = gpst.astype('datetime64[us]').view(np.int64)
+    except ValueError:
+        return None
+    
+    naive_seconds, microseconds = np.divmod(naive_us, 1_000_000)
+    seconds_of_day = naive_seconds % 86400
+    
+    # Integer microseconds, as in parse_gpst_timestamp
+    unix_us = (naive_seconds + local_utc_offsets(naive_seconds)) * 1_000_000 + microseconds
+    nanoseconds = unix_us * 1_000
+    milliseconds = unix_us // 1_000
+    
+    return [f"{ns} {lat} {lon} {height} nan {sats} nan {age} "
+            f"{sod // 3600:02d}:{sod // 60 % 60:02d}:{sod % 60:02d} {quality} {ms}"
+            for ns, lat, lon, height, sats, age, sod, quality, ms in zip(
+                nanoseconds.tolist(), data['latitude'].tolist(), data['longitude'].tolist(),
+                data['height'].tolist(), data['satellites'].tolist(), data['age'].tolist(),
+                seconds_of_day.tolist(), data['quality'].tolist(), milliseconds.tolist())]
+
+
+def convert_solution_lines(infile, outfile):
+    """
+    Convert a solution.pos file line by line.
+    
+    Args:
+        infile: Open solution.pos file (text mode)
+        outfile: Open output .gnss file (text mode)
+    
+    Returns:
+        tuple: (lines_processed, lines_converted)
+    """
+    lines_processed = 0
+    lines_converted = 0
+    
+    for line_num, line in enumerate(infile, 1):
+        # Skip header lines (starting with %)
+        if line.startswith('%'):
+            continue
+        
+        # Skip empty lines
+        if line.isspace():
+            continue
+        
+        lines_processed += 1
+        
+        # Parse the solution line
+        data = parse_solution_line(line)
+        if data is None:
+            continue
+        
+        # Convert to GNSS format
+        gnss_line = convert_to_gnss_format(data)
+        if gnss_line is None:
+            continue
+        
+        # Write to output file
+        outfile.write(gnss_line + '\n')
+        lines_converted += 1
+        
+        # Progress indication for large files
+        if lines_processed % 1000 == 0:
+            print(f"Processed {lines_processed} lines, converted {lines_converted}...")
+    
+    return lines_processed, lines_converted
+
+
 def convert_rtk_to_gnss(input_file, output_file):
     """
     Convert RTK solution.pos file to GNSS format.
@@ -149,39 +302,19 @@ def convert_rtk_to_gnss(input_file, output_file):
     
     try:
         with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
-            lines_processed = 0
-            lines_converted = 0
-            
             print(f"Converting '{input_file}' to '{output_file}'...")
             
-            for line_num, line in enumerate(infile, 1):
-                # Skip header lines (starting with %)
-                if line.startswith('%'):
-                    continue
-                
-                # Skip empty lines
-                if not line.strip():
-                    continue
-                
-                lines_processed += 1
-                
-                # Parse the solution line
-                data = parse_solution_line(line)
-                if data is None:
-                    continue
-                
-                # Convert to GNSS format
-                gnss_line = convert_to_gnss_format(data)
-                if gnss_line is None:
-                    continue
-                
-                # Write to output file
-                outfile.write(gnss_line + '\n')
-                lines_converted += 1
-                
-                # Progress indication for large files
-                if lines_processed % 1000 == 0:
-                    print(f"Processed {lines_processed} lines, converted {lines_converted}...")
+            # Parse the whole file in one pass when NumPy is available
+            gnss_lines = parse_solution_file(infile) if np is not None else None
+            
+            if gnss_lines is not None:
+                lines_processed = lines_converted = len(gnss_lines)
+                if gnss_lines:
+                    outfile.write('\n'.join(gnss_lines) + '\n')
+            else:
+                # Fall back to the per-line parser, which skips and reports bad lines
+                infile.seek(0)
+                lines_processed, lines_converted = convert_solution_lines(infile, outfile)
             
             print(f"Conversion complete!")
             print(f"Total lines processed: {lines_processed}")